@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -16,43 +17,72 @@ db = SQLAlchemy(model_class=Base)
 login_manager = LoginManager()
 
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key_change_in_production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+@login_manager.user_loader
+def load_user(user_id):
+    from models import User
+    return User.query.get(int(user_id))
 
+def create_app(config=None, started=None):
+    """Create the application without touching the database or the filesystem.
 
-database_url = os.environ.get("DATABASE_URL", "sqlite:///school_photos.db")
+    Run `flask init-db` to create the schema and the upload folder. Pass
+    `started`, a time.perf_counter() value taken before the entry point's
+    imports, to include module import time in the startup report.
+    """
+    timings = {}
+    last = time.perf_counter()
+    if started is None:
+        started = last
+    else:
+        timings['imports'] = (last - started) * 1000
 
-if "ep-delicate-art-a23v64ad.eu-central-1.aws.neon.tech" in database_url:
-    database_url = "sqlite:///school_photos.db"
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+    def mark(phase):
+        nonlocal last
+        now = time.perf_counter()
+        timings[phase] = (now - last) * 1000
+        last = now
 
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key_change_in_production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///school_photos.db")
 
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message = 'Please log in to access this page.'
+    if "ep-delicate-art-a23v64ad.eu-central-1.aws.neon.tech" in database_url:
+        database_url = "sqlite:///school_photos.db"
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
 
-@login_manager.user_loader
-def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  
+
+    if config:
+        app.config.update(config)
+    mark('config')
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'login'
+    login_manager.login_message = 'Please log in to access this page.'
+    mark('extensions')
 
-with app.app_context():
-    
     import models
+    mark('models')
+
     import routes
-    
-   
-    db.create_all()
-    
-   
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    routes.init_app(app)
+    mark('routes')
+
+    import cli
+    cli.init_app(app)
+    mark('cli')
+
+    timings['total'] = (time.perf_counter() - started) * 1000
+    app.config['STARTUP_TIMINGS'] = timings
+    app.logger.info('Startup timings (ms): %s',
+                    ', '.join(f'{phase}={ms:.1f}' for phase, ms in timings.items()))
 
+    return app
@@ -0,0 +1,357 @@
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text
+
+from app import db
+from models import User, Category, Post, Like, Comment
+
+# create_app registers these commands in every web worker, so tarfile,
+# tempfile and the process pool are imported inside the commands that use them.
+
+# Tables are exported and imported in foreign key order
+EXPORT_MODELS = [
+    ('users', User),
+    ('categories', Category),
+    ('posts', Post),
+    ('likes', Like),
+    ('comments', Comment),
+]
+
+MEDIA_PREFIX = 'media/'
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _deserialize_row(table, row, offsets):
+    """Turn a decoded NDJSON object back into column values for `table`
+
+    Primary and foreign keys are shifted by the offset of the table they
+    belong to, so an archive can be appended to a database that has rows.
+    """
+    values = {}
+    for column in table.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        if value is not None and isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        if value is not None and column.primary_key:
+            value += offsets[table.name]
+        elif value is not None and column.foreign_keys:
+            value += offsets[next(iter(column.foreign_keys)).column.table.name]
+        values[column.name] = value
+    return values
+
+
+def _process_image(filename, data, upload_folder):
+    """Write an imported image, resizing it only if it is wider than upload_post allows
+
+    Images were already compressed when they were uploaded, so they are
+    written unchanged unless a resize is needed to avoid another lossy pass.
+    Returns False when PIL cannot read the file, which is then copied as is.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    filepath = os.path.join(upload_folder, filename)
+    # Save under a temporary name so a resumed import never mistakes a half-written file for a finished one
+    tmp_path = os.path.join(upload_folder, '.importing_' + filename)
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        image = None
+    try:
+        if image is not None and image.width > 1080:
+            ratio = 1080 / image.width
+            new_height = int(image.height * ratio)
+            resized = image.resize((1080, new_height), Image.Resampling.LANCZOS)
+            resized.save(tmp_path, format=image.format, optimize=True, quality=85)
+        else:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return image is not None
+
+
+def _load_progress(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_progress(path, progress):
+    # Write to a temporary file first so an interrupted import never leaves a truncated progress file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def _insert_batch(table, batch, check_existing):
+    """Insert one chunk in its own transaction and return the number of rows inserted
+
+    With `check_existing`, rows whose id already exists are skipped. This is
+    only used for the chunk a previous run may have committed just before it
+    crashed, but not yet recorded in the progress file.
+    """
+    rows = batch
+    if check_existing:
+        ids = [row['id'] for row in batch]
+        existing = set(db.session.scalars(select(table.c.id).where(table.c.id.in_(ids))))
+        rows = [row for row in batch if row['id'] not in existing]
+    if rows:
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def _table_offsets(append):
+    """Return the amount to shift imported ids by for each table
+
+    Without `append` every target table must be empty, because archive ids
+    would otherwise collide with, and attach children to, unrelated rows.
+    """
+    offsets = {}
+    non_empty = []
+    for _, model in EXPORT_MODELS:
+        table = model.__table__
+        max_id = db.session.scalar(select(func.max(table.c.id))) or 0
+        if max_id and not append:
+            non_empty.append(table.name)
+        offsets[table.name] = max_id
+    if non_empty:
+        raise click.ClickException(
+            f'Tables already contain rows: {", ".join(non_empty)}. '
+            'Pass --append to add the archive with new ids after the existing rows.'
+        )
+    return offsets
+
+
+def _reset_sequences():
+    """Move PostgreSQL id sequences past the imported primary keys"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    preparer = db.engine.dialect.identifier_preparer
+    for _, model in EXPORT_MODELS:
+        table_name = preparer.format_table(model.__table__)
+        db.session.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                 f"COALESCE((SELECT MAX(id) FROM {table_name}), 0) + 1, false)"),
+            {'table': table_name}
+        )
+    db.session.commit()
+
+
+def _import_media(tar, workers):
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    processed = unrecognised = failed = 0
+
+    def collect(futures):
+        nonlocal processed, unrecognised, failed
+        for future in futures:
+            filename = pending.pop(future)
+            try:
+                if not future.result():
+                    unrecognised += 1
+                processed += 1
+            except Exception as e:
+                click.echo(f'Warning: could not import {filename}: {e}', err=True)
+                failed += 1
+
+    # Bound the number of in-flight images so memory stays flat on large archives
+    max_pending = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for member in tar:
+            if not member.isfile() or not member.name.startswith(MEDIA_PREFIX):
+                continue
+            filename = os.path.basename(member.name)
+            # Files already on disk were written by a previous run
+            if not filename or os.path.exists(os.path.join(upload_folder, filename)):
+                continue
+            data = tar.extractfile(member).read()
+            pending[executor.submit(_process_image, filename, data, upload_folder)] = filename
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(list(pending))
+    click.echo(f'Imported {processed} media files '
+               f'({unrecognised} not recognised as images and copied unchanged, {failed} failed)')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the database tables and the upload folder."""
+    db.create_all()
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    click.echo('Initialized the database')
+
+
+@click.command('export-data')
+@click.argument('archive', type=click.Path(dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched from the database per round trip.')
+@click.option('--no-media', is_flag=True, help='Skip uploaded images.')
+@with_appcontext
+def export_data(archive, batch_size, no_media):
+    """Export users, posts, likes, comments and media to a tar archive of NDJSON files.
+
+    The archive is gzip compressed when ARCHIVE ends in .gz or .tgz.
+    """
+    import tarfile
+    import tempfile
+
+    media = missing = 0
+
+    def add_media(filename):
+        nonlocal media, missing
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        if os.path.exists(filepath):
+            tar.add(filepath, arcname=MEDIA_PREFIX + filename)
+            media += 1
+        else:
+            missing += 1
+
+    # Read every table in one transaction so likes and comments never point at
+    # posts created after posts.ndjson was written. SQLite does not accept
+    # REPEATABLE READ and only allows a single writer anyway.
+    if db.engine.dialect.name != 'sqlite':
+        db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+    compressed = archive.endswith(('.gz', '.tgz'))
+    with tarfile.open(archive, 'w:gz' if compressed else 'w') as tar:
+        for name, model in EXPORT_MODELS:
+            table = model.__table__
+            count = 0
+            # tarfile needs the member size up front, so spool each table to disk before adding it
+            with tempfile.TemporaryFile() as spool:
+                result = db.session.execute(
+                    select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+                )
+                for row in result.mappings():
+                    record = {key: _serialize(value) for key, value in row.items()}
+                    spool.write(json.dumps(record).encode('utf-8') + b'\n')
+                    count += 1
+                    # Media is written as the rows stream past instead of being collected first
+                    if not no_media:
+                        if name == 'users' and record['profile_image']:
+                            add_media(record['profile_image'])
+                        elif name == 'posts' and record['image_filename']:
+                            add_media(record['image_filename'])
+                result.close()
+
+                info = tarfile.TarInfo(f'{name}.ndjson')
+                info.size = spool.tell()
+                info.mtime = int(time.time())
+                spool.seek(0)
+                tar.addfile(info, spool)
+            click.echo(f'Exported {count} {name}')
+
+        if not no_media:
+            click.echo(f'Exported {media} media files ({missing} missing)')
+
+    db.session.rollback()
+
+
+@click.command('import-data')
+@click.argument('archive', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Rows inserted per transaction.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Processes used for image processing.')
+@click.option('--progress-file', default=None, help='Where to record progress. Defaults to ARCHIVE.progress.')
+@click.option('--no-media', is_flag=True, help='Skip uploaded images.')
+@click.option('--append', is_flag=True, help='Import into tables that already have rows, giving imported rows new ids.')
+@with_appcontext
+def import_data(archive, batch_size, workers, progress_file, no_media, append):
+    """Bulk import an archive created by export-data.
+
+    Rows are inserted with executemany in chunked transactions. Progress is
+    recorded after every committed chunk, so re-running the same command
+    after an interruption resumes where it stopped. The progress file is
+    removed once the import completes.
+
+    The target tables must be empty unless --append is given.
+    """
+    import tarfile
+
+    progress_file = progress_file or archive + '.progress'
+    progress = _load_progress(progress_file)
+    for name, model in EXPORT_MODELS:
+        if progress.get('done', {}).get(name) and \
+                db.session.scalar(select(model.__table__.c.id).limit(1)) is None:
+            click.echo(f'Warning: {progress_file} says {name} were imported, but the '
+                       f'{model.__table__.name} table is empty; starting a new import', err=True)
+            progress = {}
+            break
+
+    resuming = bool(progress)
+    if resuming:
+        click.echo(f'Resuming from {progress_file}')
+    else:
+        progress = {'batch_size': batch_size, 'offsets': _table_offsets(append), 'done': {}}
+        _save_progress(progress_file, progress)
+    offsets = progress['offsets']
+
+    with tarfile.open(archive, 'r:*') as tar:
+        for name, model in EXPORT_MODELS:
+            try:
+                member = tar.getmember(f'{name}.ndjson')
+            except KeyError:
+                continue
+
+            table = model.__table__
+            done = progress['done'].get(name, 0)
+            # The previous run may have committed one more chunk than it recorded
+            check_until = done + progress['batch_size'] if resuming else 0
+            inserted = 0
+            batch = []
+
+            def flush():
+                nonlocal done, inserted
+                inserted += _insert_batch(table, batch, check_existing=done < check_until)
+                done += len(batch)
+                progress['done'][name] = done
+                _save_progress(progress_file, progress)
+
+            for index, line in enumerate(tar.extractfile(member)):
+                # Lines before `done` were committed by a previous run
+                if index < done:
+                    continue
+                batch.append(_deserialize_row(table, json.loads(line), offsets))
+                if len(batch) >= batch_size:
+                    flush()
+                    batch = []
+            if batch:
+                flush()
+            click.echo(f'Imported {inserted} {name}')
+
+        _reset_sequences()
+
+        if not no_media:
+            _import_media(tar, workers)
+
+    # The import finished, so a later run of the same archive must start from scratch
+    if os.path.exists(progress_file):
+        os.remove(progress_file)
+
+
+def init_app(app):
+    app.cli.add_command(init_db)
+    app.cli.add_command(export_data)
+    app.cli.add_command(import_data)
@@ -1,5 +1,9 @@
-from app import app
+import time
+started = time.perf_counter()
+
+from app import create_app
+
+app = create_app(started=started)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
-
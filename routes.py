@@ -1,15 +1,29 @@
 import os
 import uuid
-from PIL import Image
-from flask import render_template, flash, redirect, url_for, request, jsonify
+from flask import current_app, render_template, flash, redirect, url_for, request, jsonify
 from flask_login import login_user, logout_user, current_user, login_required
 from werkzeug.utils import secure_filename
-from app import app, db
+from app import db
 from models import User, Post, Like, Comment, Category
 from sqlalchemy import func
-from forms import LoginForm, RegistrationForm, PostForm, CommentForm, EditProfileForm, SearchForm
 
-@app.route('/')
+# PIL and the WTForms based forms module are imported inside the views that
+# need them so that creating the app stays cheap.
+
+_routes = []
+
+def route(rule, **options):
+    """Record a view so init_app can register it on an application"""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def init_app(app):
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+@route('/')
 def index():
     page = request.args.get('page', 1, type=int)
     
@@ -18,8 +32,9 @@ def index():
     
     return render_template('index.html', posts=posts)
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
+    from forms import LoginForm
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     
@@ -34,8 +49,9 @@ def login():
     
     return render_template('login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
+    from forms import RegistrationForm
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     
@@ -52,14 +68,15 @@ def register():
     
     return render_template('register.html', form=form)
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     logout_user()
     return redirect(url_for('index'))
 
-@app.route('/upload', methods=['GET', 'POST'])
+@route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_post():
+    from forms import PostForm
     form = PostForm()
     if form.validate_on_submit():
         # Handle file upload
@@ -67,9 +84,11 @@ def upload_post():
         if file:
             # Generate unique filename
             filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             
             # Save and resize image
+            from PIL import Image
+            os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
             image = Image.open(file.stream)
             # Resize image to max 1080px width while maintaining aspect ratio
             if image.width > 1080:
@@ -93,7 +112,7 @@ def upload_post():
     
     return render_template('upload.html', form=form)
 
-@app.route('/profile/<username>')
+@route('/profile/<username>')
 def profile(username):
     user = User.query.filter_by(username=username).first_or_404()
     page = request.args.get('page', 1, type=int)
@@ -101,9 +120,10 @@ def profile(username):
         page=page, per_page=12, error_out=False)
     return render_template('profile.html', user=user, posts=posts)
 
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@route('/edit_profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
+    from forms import EditProfileForm
     form = EditProfileForm(current_user.username, current_user.email)
     if form.validate_on_submit():
         current_user.username = form.username.data
@@ -115,9 +135,11 @@ def edit_profile():
             # Generate unique filename
             filename = secure_filename(form.profile_image.data.filename)
             filename = f"{uuid.uuid4().hex}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             
             # Resize and save image
+            from PIL import Image
+            os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
             image = Image.open(form.profile_image.data)
             # Make it square and smaller for profile pictures
             size = min(image.size)
@@ -132,7 +154,7 @@ def edit_profile():
             
             # Delete old profile image if exists
             if current_user.profile_image:
-                old_path = os.path.join(app.config['UPLOAD_FOLDER'], current_user.profile_image)
+                old_path = os.path.join(current_app.config['UPLOAD_FOLDER'], current_user.profile_image)
                 if os.path.exists(old_path):
                     os.remove(old_path)
             
@@ -147,7 +169,7 @@ def edit_profile():
         form.bio.data = current_user.bio
     return render_template('edit_profile.html', form=form)
 
-@app.route('/like/<int:post_id>')
+@route('/like/<int:post_id>')
 @login_required
 def like_post(post_id):
     post = Post.query.get_or_404(post_id)
@@ -174,9 +196,10 @@ def like_post(post_id):
     
     return redirect(request.referrer or url_for('index'))
 
-@app.route('/comment/<int:post_id>', methods=['POST'])
+@route('/comment/<int:post_id>', methods=['POST'])
 @login_required
 def add_comment(post_id):
+    from forms import CommentForm
     post = Post.query.get_or_404(post_id)
     form = CommentForm()
     
@@ -191,8 +214,9 @@ def add_comment(post_id):
     
     return redirect(request.referrer or url_for('index'))
 
-@app.route('/search')
+@route('/search')
 def search():
+    from forms import SearchForm
     form = SearchForm()
     users = []
     posts = []
@@ -208,20 +232,21 @@ def search():
     
     return render_template('search.html', form=form, users=users, posts=posts, query=request.args.get('query', ''))
 
-@app.route('/uploads/<filename>')
+@route('/uploads/<filename>')
 def uploaded_file(filename):
     from flask import send_from_directory
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
 
-@app.route('/post/<int:post_id>')
+@route('/post/<int:post_id>')
 def view_post(post_id):
+    from forms import CommentForm
     post = Post.query.get_or_404(post_id)
     comments = post.comments.order_by(Comment.created_at.desc()).all()
     comment_form = CommentForm()
     return render_template('view_post.html', post=post, comments=comments, comment_form=comment_form)
 
 # Admin routes
-@app.route('/admin')
+@route('/admin')
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
@@ -245,7 +270,7 @@ def admin_dashboard():
                          total_users=total_users,
                          total_posts=total_posts)
 
-@app.route('/admin/categories')
+@route('/admin/categories')
 @login_required
 def admin_categories():
     if not current_user.is_admin:
@@ -255,7 +280,7 @@ def admin_categories():
     categories = Category.query.all()
     return render_template('admin/categories.html', categories=categories)
 
-@app.route('/admin/categories/create', methods=['GET', 'POST'])
+@route('/admin/categories/create', methods=['GET', 'POST'])
 @login_required
 def admin_create_category():
     if not current_user.is_admin:
@@ -285,7 +310,7 @@ def admin_create_category():
     
     return render_template('admin/create_category.html')
 
-@app.route('/admin/categories/<int:category_id>/toggle')
+@route('/admin/categories/<int:category_id>/toggle')
 @login_required
 def admin_toggle_category(category_id):
     if not current_user.is_admin:
@@ -300,7 +325,7 @@ def admin_toggle_category(category_id):
     flash(f'Category "{category.name}" has been {status}.')
     return redirect(url_for('admin_categories'))
 
-@app.route('/admin/ranking')
+@route('/admin/ranking')
 @login_required
 def admin_ranking():
     if not current_user.is_admin:
@@ -316,7 +341,7 @@ def admin_ranking():
     
     return render_template('admin/ranking.html', posts_with_likes=posts_with_likes)
 
-@app.route('/admin/users')
+@route('/admin/users')
 @login_required
 def admin_users():
     if not current_user.is_admin:
@@ -335,7 +360,7 @@ def admin_users():
     
     return render_template('admin/users.html', users=users)
 
-@app.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+@route('/admin/users/<int:user_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_user(user_id):
     if not current_user.is_admin:
@@ -357,13 +382,13 @@ def admin_delete_user(user_id):
         
         # Delete the image file
         if post.image_filename:
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], post.image_filename)
+            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], post.image_filename)
             if os.path.exists(image_path):
                 os.remove(image_path)
     
     # Delete profile image if exists
     if user.profile_image:
-        profile_path = os.path.join(app.config['UPLOAD_FOLDER'], user.profile_image)
+        profile_path = os.path.join(current_app.config['UPLOAD_FOLDER'], user.profile_image)
         if os.path.exists(profile_path):
             os.remove(profile_path)
     
@@ -378,7 +403,7 @@ def admin_delete_user(user_id):
     flash(f'User {user.username} has been deleted successfully.')
     return redirect(url_for('admin_users'))
 
-@app.route('/post/<int:post_id>/delete', methods=['POST'])
+@route('/post/<int:post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
@@ -394,7 +419,7 @@ def delete_post(post_id):
     
     # Delete the image file
     if post.image_filename:
-        image_path = os.path.join(app.root_path, 'static', 'uploads', post.image_filename)
+        image_path = os.path.join(current_app.root_path, 'static', 'uploads', post.image_filename)
         if os.path.exists(image_path):
             os.remove(image_path)
     
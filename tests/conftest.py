@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app with its own SQLite database and upload folder under tmp_path"""
+    def make(name):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}.db',
+            'UPLOAD_FOLDER': str(tmp_path / f'{name}_uploads'),
+        })
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exit_code == 0, result.output
+        return app
+    return make
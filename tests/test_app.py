@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+from app import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter, since other tests import PIL and the forms
+CREATE_APP = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'UPLOAD_FOLDER': sys.argv[2]}, started=started)
+print(json.dumps({
+    'modules': [name for name in ('PIL', 'forms', 'tarfile', 'multiprocessing') if name in sys.modules],
+    'timings': app.config['STARTUP_TIMINGS'],
+}))
+'''
+
+
+def test_create_app_has_no_side_effects_or_heavy_imports(tmp_path):
+    database = tmp_path / 'app.db'
+    uploads = tmp_path / 'uploads'
+
+    output = subprocess.run(
+        [sys.executable, '-c', CREATE_APP, f'sqlite:///{database}', str(uploads)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    report = json.loads(output)
+
+    assert not database.exists()
+    assert not uploads.exists()
+    assert report['modules'] == []
+    assert list(report['timings']) == ['imports', 'config', 'extensions', 'models', 'routes', 'cli', 'total']
+    phases = sum(ms for phase, ms in report['timings'].items() if phase != 'total')
+    assert report['timings']['total'] >= phases
+
+
+def test_init_db_creates_database_and_upload_folder(tmp_path):
+    database = tmp_path / 'app.db'
+    uploads = tmp_path / 'uploads'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'UPLOAD_FOLDER': str(uploads)})
+    assert list(app.config['STARTUP_TIMINGS']) == ['config', 'extensions', 'models', 'routes', 'cli', 'total']
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert result.exit_code == 0, result.output
+    assert database.exists()
+    assert uploads.is_dir()
@@ -0,0 +1,158 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from app import db
+from models import User, Post, Like, Comment
+
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=list(args))
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def write_progress(archive, done):
+    with open(archive + '.progress', 'w') as f:
+        json.dump({'batch_size': 2, 'offsets': {'user': 0, 'category': 0, 'post': 0, 'like': 0, 'comment': 0},
+                   'done': done}, f)
+
+
+def counts(app):
+    with app.app_context():
+        return {model.__name__: db.session.query(model).count() for model in (User, Post, Like, Comment)}
+
+
+@pytest.fixture
+def archive(make_app, tmp_path):
+    """Export a small data set and return the archive path"""
+    app = make_app('source')
+    with app.app_context():
+        user = User(username='alice', email='alice@example.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        for i in range(5):
+            filename = f'photo{i}.jpg'
+            Image.new('RGB', (60, 40), (i * 40, 0, 0)).save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            db.session.add(Post(caption=f'post {i}', image_filename=filename, user_id=user.id))
+        db.session.commit()
+        db.session.add(Like(user_id=user.id, post_id=2))
+        db.session.add(Comment(content='nice', user_id=user.id, post_id=3))
+        db.session.commit()
+
+    path = str(tmp_path / 'export.tgz')
+    run(app, 'export-data', path)
+    return path
+
+
+EXPECTED = {'User': 1, 'Post': 5, 'Like': 1, 'Comment': 1}
+
+
+def test_round_trip(make_app, archive):
+    app = make_app('target')
+    run(app, 'import-data', archive, '--batch-size', '2', '--workers', '1')
+
+    assert counts(app) == EXPECTED
+    assert not os.path.exists(archive + '.progress')
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'photo1.jpg'), 'rb') as f:
+        imported = f.read()
+    with open(os.path.join(os.path.dirname(archive), 'source_uploads', 'photo1.jpg'), 'rb') as f:
+        assert imported == f.read()
+
+
+def test_import_twice_into_fresh_databases(make_app, archive):
+    run(make_app('first'), 'import-data', archive, '--workers', '1')
+    app = make_app('second')
+    run(app, 'import-data', archive, '--workers', '1')
+
+    assert counts(app) == EXPECTED
+
+
+def test_resume_after_commit_before_progress_was_saved(make_app, archive):
+    app = make_app('target')
+    run(app, 'import-data', archive, '--batch-size', '2', '--workers', '1')
+    # Pretend the run crashed after committing posts 4 and 5 but before recording them
+    write_progress(archive, {'users': 1, 'categories': 0, 'posts': 3})
+
+    result = run(app, 'import-data', archive, '--batch-size', '2', '--workers', '1')
+
+    assert 'Imported 0 posts' in result.output
+    assert counts(app) == EXPECTED
+    assert not os.path.exists(archive + '.progress')
+
+
+def test_stale_progress_for_empty_tables_is_ignored(make_app, archive):
+    write_progress(archive, {'users': 1, 'categories': 0, 'posts': 5, 'likes': 1, 'comments': 1})
+    app = make_app('target')
+
+    result = run(app, 'import-data', archive, '--workers', '1')
+
+    assert 'table is empty' in result.output
+    assert counts(app) == EXPECTED
+
+
+def add_admin(app):
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('secret')
+        db.session.add(admin)
+        db.session.commit()
+
+
+def test_refuses_to_import_into_tables_with_rows(make_app, archive):
+    app = make_app('target')
+    add_admin(app)
+
+    result = app.test_cli_runner().invoke(args=['import-data', archive, '--workers', '1'])
+
+    assert result.exit_code != 0
+    assert '--append' in result.output
+    assert counts(app) == {'User': 1, 'Post': 0, 'Like': 0, 'Comment': 0}
+
+
+def test_append_gives_imported_rows_new_ids(make_app, archive):
+    app = make_app('target')
+    add_admin(app)
+
+    result = run(app, 'import-data', archive, '--append', '--workers', '1')
+
+    assert 'Imported 1 users' in result.output
+    assert counts(app) == {'User': 2, 'Post': 5, 'Like': 1, 'Comment': 1}
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').one()
+        assert alice.id == 2
+        assert {post.author.username for post in Post.query.all()} == {'alice'}
+        assert Like.query.one().post.caption == 'post 1'
+        assert Comment.query.one().post.caption == 'post 2'
+
+
+def test_unreadable_media_does_not_abort_the_import(make_app, tmp_path):
+    source = make_app('source')
+    folder = source.config['UPLOAD_FOLDER']
+    with source.app_context():
+        user = User(username='alice', email='alice@example.com', profile_image='notes.jpg')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Post(caption='wide', image_filename='wide.jpg', user_id=user.id))
+        db.session.commit()
+    with open(os.path.join(folder, 'notes.jpg'), 'wb') as f:
+        f.write(b'not an image')
+    # A wide image needs resizing, which fails because the file is truncated
+    Image.new('RGB', (2000, 100), (255, 0, 0)).save(os.path.join(folder, 'wide.jpg'))
+    with open(os.path.join(folder, 'wide.jpg'), 'r+b') as f:
+        f.truncate(200)
+    archive = str(tmp_path / 'export.tar')
+    run(source, 'export-data', archive)
+    app = make_app('target')
+
+    result = run(app, 'import-data', archive, '--workers', '1')
+
+    assert 'Imported 1 media files (1 not recognised as images and copied unchanged, 1 failed)' in result.output
+    assert 'could not import wide.jpg' in result.output
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'notes.jpg'), 'rb') as f:
+        assert f.read() == b'not an image'
+    assert sorted(os.listdir(app.config['UPLOAD_FOLDER'])) == ['notes.jpg']